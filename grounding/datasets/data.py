@@ -1,16 +1,70 @@
-import json
+import multiprocessing as mp
 import os
+import queue
 import re
-from collections.abc import Iterable
+import threading
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import cached_property
+from itertools import batched
 from pathlib import Path
 
+import orjson
 from loguru import logger
 from pydantic import BaseModel
 from tqdm import tqdm
 
+from ..utils.jsonl import iter_jsonl, readahead
+from ..utils.text import strip_article
+
+# Labels may contain any text, including '<' and newlines, up to the first
+# </ref>. re.ASCII only narrows \s here; labels still accept any Unicode.
 _REF_PATTERN = re.compile(
-    r"<ref>(?P<label>.+?)</ref>\s*(?P<bboxes>\[\[.*?\]\])", re.DOTALL
+    r"<ref>((?:(?!</ref>).)+)</ref>"
+    r"\s*(\[\[[^\[\]]*\](?:\s*,\s*\[[^\[\]]*\])*\])",
+    re.ASCII | re.DOTALL,
 )
+_find_refs = _REF_PATTERN.finditer
+
+_PREFETCH_SIZE = 1024
+_PARSE_CHUNK_SIZE = 256
+_WRITE_BATCH_SIZE = 1 << 16
+_END_OF_DATA = object()
+
+
+def _parse_bboxes(text: str) -> list[list[float]]:
+    # orjson rejects what JSON rejects (``nan``, ``inf``, ``1_0``, ...) and
+    # still beats splitting the text by hand and calling float() per token.
+    return [list(map(float, bbox)) for bbox in orjson.loads(text)]
+
+
+def _parse_item(item: dict) -> dict:
+    assert len(item["data"]["image"]) == 1, "Only one image is supported"
+    image = item["data"]["image"][0]
+    objs: dict[str, list[list[float]]] = {}
+    labels: dict[str, str] = {}
+    for conv in item["data"]["conversations"]:
+        if conv["from"] == "gpt":
+            conv_str = conv["value"]
+            for match in _find_refs(conv_str):
+                raw_label = match.group(1)
+                label = labels.get(raw_label)
+                if label is None:
+                    label = labels[raw_label] = raw_label.strip().lower()
+                objs.setdefault(label, []).extend(_parse_bboxes(match.group(2)))
+    return {
+        "image": image,
+        "objs": objs,
+        "source_dataset": item["source"],
+        "source_id": str(item["data"]["id"]),
+        "num_objs": len(objs),
+        "num_bbox": sum(len(bboxes) for bboxes in objs.values()),
+    }
+
+
+def _parse_chunk(items: tuple[dict, ...]) -> list[dict]:
+    return [_parse_item(item) for item in items]
 
 
 class GroundingData(BaseModel):
@@ -21,12 +75,30 @@ class GroundingData(BaseModel):
     num_objs: int
     num_bbox: int
 
+    @cached_property
+    def singles_and_multis(
+        self,
+    ) -> tuple[tuple[tuple[str, list[float], str], ...], tuple[list[float], ...]]:
+        """
+        Split ``objs`` into single-instance objects, as ``(name, bbox,
+        article-stripped name)``, and the bboxes of every other object.
+        """
+        singles = []
+        multis = []
+        for name, bboxes in self.objs.items():
+            if len(bboxes) == 1:
+                singles.append((name, bboxes[0], strip_article(name)))
+            else:
+                multis.extend(bboxes)
+        return tuple(singles), tuple(multis)
+
 
 class GroundingDataset:
     def __init__(
         self,
         data_path: str | os.PathLike | list[str | os.PathLike],
         max_items: int | None = None,
+        preload: bool = False,
     ):
         if isinstance(data_path, str | os.PathLike):
             data_path = Path(data_path)
@@ -38,58 +110,123 @@ class GroundingDataset:
             self.data_paths = [Path(path) for path in data_path]
 
         self.max_items = max_items
-        self.data = []
-        for data_path in tqdm(self.data_paths, desc="Loading data"):
-            with data_path.open("r") as f:
-                self.data.extend(
-                    [{"data": json.loads(line), "source": data_path.name} for line in f]
-                )
+        self.data: list[dict] | None = None
+        if preload:
+            self.data = []
+            for data_path in tqdm(
+                readahead(self.data_paths),
+                desc="Loading data",
+                total=len(self.data_paths),
+            ):
+                self.data.extend(self._read_items(data_path))
 
-        if self.max_items is not None:
-            self.data = self.data[: self.max_items]
+            if self.max_items is not None:
+                self.data = self.data[: self.max_items]
+
+    def __iter__(self) -> Iterator[GroundingData]:
+        for item in self._iter_items():
+            yield self.parse_item(item)
+
+    @staticmethod
+    def _read_items(data_path: Path) -> Iterator[dict]:
+        for record in iter_jsonl(data_path):
+            yield {"data": record, "source": data_path.name}
+
+    def _iter_items(self) -> Iterator[dict]:
+        if self.data is not None:
+            yield from self.data
+            return
+
+        # Read the shards in a background thread so that disk reads and JSON
+        # decoding overlap with parsing in the consumer.
+        items: queue.Queue = queue.Queue(maxsize=_PREFETCH_SIZE)
+        stop = threading.Event()
+
+        def put(item: object) -> bool:
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                count = 0
+                for data_path in readahead(self.data_paths):
+                    for item in self._read_items(data_path):
+                        if self.max_items is not None and count >= self.max_items:
+                            return
+                        if not put(item):
+                            return
+                        count += 1
+            except BaseException as e:
+                put(e)
+            finally:
+                put(_END_OF_DATA)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while (item := items.get()) is not _END_OF_DATA:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
 
     def parse_item(self, item: dict) -> GroundingData:
-        assert len(item["data"]["image"]) == 1, "Only one image is supported"
-        image = item["data"]["image"][0]
-        objs: dict[str, list[list[float]]] = {}
-        for conv in item["data"]["conversations"]:
-            if conv["from"] == "gpt":
-                conv_str = conv["value"]
-                for match in _REF_PATTERN.finditer(conv_str):
-                    label = match.group("label").strip().lower()
-                    bboxes = json.loads(match.group("bboxes"))
-                    if label not in objs:
-                        objs[label] = []
-                    for bbox in bboxes:
-                        objs[label].append([float(coord) for coord in bbox])
-        return GroundingData.model_validate(
-            {
-                "image": image,
-                "objs": objs,
-                "source_dataset": item["source"],
-                "source_id": str(item["data"]["id"]),
-                "num_objs": len(objs),
-                "num_bbox": sum(len(bboxes) for bboxes in objs.values()),
-            }
-        )
-
-    def parse_data(self) -> Iterable[GroundingData]:
-        for item in tqdm(self.data):
-            result = self.parse_item(item)
-            if result.num_objs == 0:
-                logger.warning(
-                    f"No objects found in item"
-                    f" {item['data']['id']} from {item['source']},"
-                    f" the conversation is {item['data']['conversations']}"
-                )
-                continue
-            yield result
+        # Every field is already of the declared type, so skip validation.
+        return GroundingData.model_construct(**_parse_item(item))
+
+    def parse_data(self, num_workers: int = 1) -> Iterable[GroundingData]:
+        total = len(self.data) if self.data is not None else self.max_items
+        with tqdm(total=total) as progress:
+            for item, fields in self._parse_items(num_workers):
+                progress.update()
+                if fields["num_objs"] == 0:
+                    logger.warning(
+                        f"No objects found in item"
+                        f" {item['data']['id']} from {item['source']},"
+                        f" the conversation is {item['data']['conversations']}"
+                    )
+                    continue
+                yield GroundingData.model_construct(**fields)
+
+    def _parse_items(self, num_workers: int) -> Iterator[tuple[dict, dict]]:
+        if num_workers <= 1:
+            for item in self._iter_items():
+                yield item, _parse_item(item)
+            return
+
+        # Keep a bounded number of chunks in flight and yield them in order.
+        # Workers are spawned rather than forked because the reader thread is
+        # already running.
+        pending: deque[tuple[tuple[dict, ...], Future]] = deque()
+        with ProcessPoolExecutor(
+            max_workers=num_workers, mp_context=mp.get_context("spawn")
+        ) as executor:
+            for chunk in batched(self._iter_items(), _PARSE_CHUNK_SIZE, strict=False):
+                pending.append((chunk, executor.submit(_parse_chunk, chunk)))
+                if len(pending) >= 2 * num_workers:
+                    chunk, future = pending.popleft()
+                    yield from zip(chunk, future.result(), strict=True)
+            while pending:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result(), strict=True)
 
 
 if __name__ == "__main__":
     dataset = GroundingDataset(
         "/mnt/aigc/users/pufanyi/workspace/playground/grouding/data/jsonl",
     )
-    with open("data/result_dataset.jsonl", "w") as f:
-        for data in dataset.parse_data():
-            f.write(data.model_dump_json() + "\n")
+    buffer = bytearray()
+    with open("data/result_dataset.jsonl", "wb") as f:
+        for data in dataset.parse_data(num_workers=os.cpu_count() or 1):
+            buffer += orjson.dumps(data.model_dump(), option=orjson.OPT_APPEND_NEWLINE)
+            if len(buffer) >= _WRITE_BATCH_SIZE:
+                f.write(buffer)
+                buffer.clear()
+        f.write(buffer)
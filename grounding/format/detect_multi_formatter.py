@@ -3,6 +3,7 @@ import random
 
 from ..datasets.data import GroundingData
 from ..utils.bbox import random_bbox
+from ..utils.text import strip_article
 from .formatter import Formatter, SITEData
 
 TEMPLATE = """\
@@ -14,6 +15,7 @@ the bottom-right coordinates within a normalized range of 0 to 1, \
 where [0, 0] is the top-left corner and [1, 1] is the bottom-right \
 corner of the image.\
 """
+TEMPLATE_PREFIX, TEMPLATE_SUFFIX = TEMPLATE.split("{obj_name}")
 
 
 def _signature(
@@ -27,10 +29,13 @@ class DetectMultiFormatter(Formatter):
         super().__init__("detect_multi")
 
     def check_eligible(self, data: GroundingData) -> bool:
-        return any(len(bboxes) > 1 for bboxes in data.objs.values())
+        return self.check_objs(data.objs)
         # return True
         # return random.random() < 0.1
 
+    def check_objs(self, objs: dict[str, list[list[float]]]) -> bool:
+        return any(len(bboxes) > 1 for bboxes in objs.values())
+
     def format(self, data: GroundingData) -> SITEData:
         multi_objs = [
             (name, bboxes) for name, bboxes in data.objs.items() if len(bboxes) > 1
@@ -41,13 +46,9 @@ class DetectMultiFormatter(Formatter):
             obj_name, target_bboxes = random.choice(multi_objs)
         target_len = len(target_bboxes)
 
-        cleaned_obj_name = obj_name
-        for start_str in ["a ", "an ", "the "]:
-            if cleaned_obj_name.startswith(start_str):
-                cleaned_obj_name = cleaned_obj_name[len(start_str) :]
-                break
+        cleaned_obj_name = strip_article(obj_name)
 
-        prompt = TEMPLATE.format(obj_name=cleaned_obj_name)
+        prompt = TEMPLATE_PREFIX + cleaned_obj_name + TEMPLATE_SUFFIX
 
         distractors: list[list[list[float]]] = []
         used_signatures = {_signature(target_bboxes)}
@@ -125,13 +126,11 @@ class DetectMultiFormatter(Formatter):
         choices.extend(random.sample(distractors, 3))
         str_choices = [json.dumps(choice) for choice in choices]
 
-        return SITEData.model_validate(
-            {
-                "source_dataset": data.source_dataset,
-                "source_id": data.source_id,
-                "image": data.image,
-                "question": prompt,
-                "choices": str_choices,
-                "question_type": self.name,
-            }
+        return SITEData(
+            source_dataset=data.source_dataset,
+            source_id=data.source_id,
+            image=data.image,
+            question=prompt,
+            choices=str_choices,
+            question_type=self.name,
         )
@@ -1,5 +1,8 @@
 import random
 from collections.abc import Sequence
+from itertools import starmap
+
+import numpy as np
 
 from ..datasets.data import GroundingData
 from .formatter import Formatter, SITEData
@@ -12,31 +15,45 @@ and [x2, y2] the bottom-right coordinates within a normalized range of 0 to 1, \
 where [0, 0] is the top-left corner and [1, 1] is the bottom-right corner of \
 the image.\
 """
+TEMPLATE_PREFIX, TEMPLATE_SUFFIX = TEMPLATE.split("{categories}")
+
+_ENTRY_FORMAT = "{}: [{:.3f}, {:.3f}, {:.3f}, {:.3f}]".format
+
+# (max_delta, max_change) used by _mutate_entries at each escalation level
+_ESCALATION = ((0.05, 0.6), (0.1, 0.8), (0.2, 1.0))
+_STALL_LIMIT = 8
+_MAX_ATTEMPTS = 30
+# NumPy jitter only beats the per-bbox loop from about this many entries
+_VECTORISE_MIN_ENTRIES = 8
+# Below this many entries _label_swap_pairs enumerates every pair; grouping by
+# category only pays off for larger answers.
+_PAIR_ENUMERATION_LIMIT = 12
 
 
 def _round_bbox(bbox: Sequence[float]) -> list[float]:
     return [round(float(coord), 3) for coord in bbox]
 
 
-def _signature(
-    entries: Sequence[tuple[str, Sequence[float]]],
-) -> tuple[tuple[str, tuple[float, float, float, float]], ...]:
-    signature = []
+def _signature(entries: Sequence[tuple[str, Sequence[float]]]) -> int:
+    # Summing entry hashes keeps the signature order-independent without a
+    # sort; unlike XOR, repeated entries do not cancel each other out.
+    signature = 0
     for name, bbox in entries:
-        rounded = tuple(_round_bbox(bbox))
-        signature.append((name, tuple(rounded)))
-    return tuple(sorted(signature))
+        signature += hash(
+            (
+                name,
+                round(bbox[0], 3),
+                round(bbox[1], 3),
+                round(bbox[2], 3),
+                round(bbox[3], 3),
+            )
+        )
+    return signature & 0xFFFFFFFFFFFFFFFF
 
 
 def _format_entries(entries: Sequence[tuple[str, Sequence[float]]]) -> str:
-    parts: list[str] = []
-    for name, bbox in entries:
-        rounded = _round_bbox(bbox)
-        parts.append(
-            f"{name}: [{rounded[0]:.3f}, {rounded[1]:.3f}, "
-            f"{rounded[2]:.3f}, {rounded[3]:.3f}]"
-        )
-    return ", ".join(parts)
+    # The fixed-precision format rounds each coordinate itself
+    return ", ".join(starmap(_ENTRY_FORMAT, ((name, *bbox) for name, bbox in entries)))
 
 
 def _clone_entries(
@@ -45,12 +62,15 @@ def _clone_entries(
     return [(name, list(bbox)) for name, bbox in entries]
 
 
-def _jitter_bbox(bbox: Sequence[float], max_delta: float = 0.05) -> list[float]:
+def _jitter_bbox(
+    bbox: Sequence[float], rng: random.Random, max_delta: float = 0.05
+) -> list[float]:
     x1, y1, x2, y2 = map(float, bbox)
-    dx1 = random.uniform(-max_delta, max_delta)
-    dy1 = random.uniform(-max_delta, max_delta)
-    dx2 = random.uniform(-max_delta, max_delta)
-    dy2 = random.uniform(-max_delta, max_delta)
+    uniform = rng.uniform
+    dx1 = uniform(-max_delta, max_delta)
+    dy1 = uniform(-max_delta, max_delta)
+    dx2 = uniform(-max_delta, max_delta)
+    dy2 = uniform(-max_delta, max_delta)
     nx1 = max(0.0, min(1.0, x1 + dx1))
     ny1 = max(0.0, min(1.0, y1 + dy1))
     nx2 = max(0.0, min(1.0, x2 + dx2))
@@ -63,17 +83,74 @@ def _jitter_bbox(bbox: Sequence[float], max_delta: float = 0.05) -> list[float]:
 
 
 def _aggressive_variant(
-    entries: Sequence[tuple[str, Sequence[float]]], max_delta: float
+    entries: Sequence[tuple[str, Sequence[float]]],
+    rng: random.Random,
+    np_rng: np.random.Generator,
+    max_delta: float,
 ) -> list[tuple[str, list[float]]]:
-    variant = _clone_entries(entries)
-    for idx, (name, bbox) in enumerate(variant):
-        variant[idx] = (name, _jitter_bbox(bbox, max_delta=max_delta))
-    random.shuffle(variant)
+    if len(entries) < _VECTORISE_MIN_ENTRIES:
+        variant = [
+            (name, _jitter_bbox(bbox, rng, max_delta=max_delta))
+            for name, bbox in entries
+        ]
+    else:
+        bboxes = np.asarray([bbox for _, bbox in entries], dtype=np.float64)
+        jittered = bboxes + np_rng.uniform(-max_delta, max_delta, bboxes.shape)
+        np.clip(jittered, 0.0, 1.0, out=jittered)
+        x1 = np.minimum(jittered[:, 0], jittered[:, 2])
+        x2 = np.maximum(jittered[:, 0], jittered[:, 2])
+        y1 = np.minimum(jittered[:, 1], jittered[:, 3])
+        y2 = np.maximum(jittered[:, 1], jittered[:, 3])
+        rounded = np.round(np.stack((x1, y1, x2, y2), axis=1), 3).tolist()
+        variant = list(zip((name for name, _ in entries), rounded, strict=True))
+    rng.shuffle(variant)
     return variant
 
 
+def _label_swap_pairs(
+    variant: Sequence[tuple[str, Sequence[float]]],
+    rng: random.Random,
+) -> list[tuple[int, int]]:
+    """
+    Pick 1-2 distinct index pairs whose entries have different categories.
+    """
+    n = len(variant)
+    if n < _PAIR_ENUMERATION_LIMIT:
+        # Enumerating every pair is cheapest for the usual handful of entries
+        pairs = [
+            (i, j)
+            for i in range(n)
+            for j in range(i + 1, n)
+            if variant[i][0] != variant[j][0]
+        ]
+        if not pairs:
+            return pairs
+        return rng.sample(pairs, min(rng.randint(1, 2), len(pairs)))
+
+    # Group entry indices by category so pairs can be sampled directly
+    by_category: dict[str, list[int]] = {}
+    for idx, (name, _) in enumerate(variant):
+        by_category.setdefault(name, []).append(idx)
+    if len(by_category) < 2:
+        return []
+
+    categories = list(by_category)
+    num_pairs = n * (n - 1) // 2 - sum(
+        len(indices) * (len(indices) - 1) // 2 for indices in by_category.values()
+    )
+    num_swaps = min(rng.randint(1, 2), num_pairs)
+    swap_pairs: set[tuple[int, int]] = set()
+    while len(swap_pairs) < num_swaps:
+        cat_i, cat_j = rng.sample(categories, 2)
+        i = rng.choice(by_category[cat_i])
+        j = rng.choice(by_category[cat_j])
+        swap_pairs.add((min(i, j), max(i, j)))
+    return list(swap_pairs)
+
+
 def _label_swap_variant(
     entries: Sequence[tuple[str, Sequence[float]]],
+    rng: random.Random,
 ) -> list[tuple[str, list[float]]]:
     """
     Generate a variant by swapping labels between two bboxes with different categories.
@@ -82,22 +159,12 @@ def _label_swap_variant(
     if len(variant) < 2:
         return variant
 
-    # Find pairs with different categories
-    different_category_pairs = []
-    for i in range(len(variant)):
-        for j in range(i + 1, len(variant)):
-            if variant[i][0] != variant[j][0]:  # Different category names
-                different_category_pairs.append((i, j))
-
-    if not different_category_pairs:
+    swap_pairs = _label_swap_pairs(variant, rng)
+    if not swap_pairs:
         # If all entries have the same category, just shuffle
-        random.shuffle(variant)
+        rng.shuffle(variant)
         return variant
 
-    # Swap labels for 1-2 random pairs
-    num_swaps = min(random.randint(1, 2), len(different_category_pairs))
-    swap_pairs = random.sample(different_category_pairs, num_swaps)
-
     for i, j in swap_pairs:
         # Swap the category names while keeping bboxes
         name_i, bbox_i = variant[i]
@@ -105,48 +172,56 @@ def _label_swap_variant(
         variant[i] = (name_j, bbox_i)
         variant[j] = (name_i, bbox_j)
 
-    random.shuffle(variant)
+    rng.shuffle(variant)
     return variant
 
 
 class DetectMultiObjectFormatter(Formatter):
-    def __init__(self) -> None:
+    def __init__(self, seed: int | None = None) -> None:
         super().__init__("detect_multi_object")
+        self._rng = random.Random(seed)
+        self._np_rng = np.random.default_rng(seed)
 
     def check_eligible(self, data: GroundingData) -> bool:
-        return data.num_objs >= 2
+        return self.check_objs(data.objs)
+
+    def check_objs(self, objs: dict[str, list[list[float]]]) -> bool:
+        return len(objs) >= 2
 
     def format(self, data: GroundingData) -> SITEData:
+        rng = self._rng
+        np_rng = self._np_rng
+        rand = rng.random
+        sample = rng.sample
+
         candidate_objs = {name: bboxes for name, bboxes in data.objs.items() if bboxes}
         target_names = list(candidate_objs)
 
         max_categories = min(6, len(target_names))
         sample_size = (
-            random.randint(2, max_categories) if max_categories > 2 else max_categories
+            rng.randint(2, max_categories) if max_categories > 2 else max_categories
         )
-        chosen_names = random.sample(target_names, sample_size)
+        chosen_names = sample(target_names, sample_size)
 
         target_entries: list[tuple[str, list[float]]] = []
         for name in chosen_names:
             bboxes = candidate_objs[name]
             take = min(len(bboxes), 3)
-            selected = random.sample(bboxes, take)
+            selected = sample(bboxes, take)
             for bbox in selected:
                 target_entries.append((name, list(bbox)))
 
-        prompt = TEMPLATE.format(categories=", ".join(chosen_names))
+        prompt = TEMPLATE_PREFIX + ", ".join(chosen_names) + TEMPLATE_SUFFIX
 
-        category_pool: dict[str, list[list[float]]] = {
-            name: [list(bbox) for bbox in bboxes]
-            for name, bboxes in data.objs.items()
-            if bboxes
-        }
+        # The pools share storage with data.objs; entries drawn from them are
+        # copied (or jittered into new lists) before they enter a candidate.
+        category_pool: dict[str, list[list[float]]] = candidate_objs
         extra_pool: list[tuple[str, list[float]]] = [
             (name, bbox) for name, boxes in category_pool.items() for bbox in boxes
         ]
 
-        # Strategy: 80% label swap, 20% mutation
-        # Each distractor is generated using random.choice based on these probabilities
+        # Strategy: 80% label swap, 20% mutation. Whenever the search stalls,
+        # escalate to mutation only, with a larger jitter and change fraction.
         distractors: list[list[tuple[str, list[float]]]] = []
         used_signatures = {_signature(target_entries)}
         target_len = len(target_entries)
@@ -161,87 +236,70 @@ class DetectMultiObjectFormatter(Formatter):
                 return True
             return False
 
-        # Generate 3 distractors using weighted random choice (80% swap, 20% mutate)
+        level = 0
+        stall = 0
         attempts = 0
-        while len(distractors) < 3 and attempts < 300:
-            # 80% probability for label swap, 20% for mutation
-            if random.random() < 0.8:
-                candidate = _label_swap_variant(target_entries)
+        while len(distractors) < 3 and attempts < _MAX_ATTEMPTS:
+            if level == 0 and rand() < 0.8:
+                candidate = _label_swap_variant(target_entries, rng)
             else:
+                max_delta, max_change = _ESCALATION[level]
                 candidate = self._mutate_entries(
-                    target_entries, category_pool, extra_pool
+                    target_entries,
+                    category_pool,
+                    extra_pool,
+                    max_delta=max_delta,
+                    max_change=max_change,
                 )
-            add_candidate(candidate)
+            if add_candidate(candidate):
+                stall = 0
+            else:
+                stall += 1
+                if stall > _STALL_LIMIT and level < len(_ESCALATION) - 1:
+                    level += 1
+                    stall = 0
             attempts += 1
 
-        # Additional fallback with gentle mutation
-        gentle_attempts = 0
-        while len(distractors) < 3 and gentle_attempts < 100:
-            candidate = self._fallback_entries(target_entries, category_pool)
-            if len(candidate) == target_len:
-                signature = _signature(candidate)
-                if signature not in used_signatures:
-                    distractors.append(candidate)
-                    used_signatures.add(signature)
-            gentle_attempts += 1
-
-        force_delta = 0.12
-        while len(distractors) < 3 and force_delta <= 0.24:
-            candidate = _aggressive_variant(target_entries, max_delta=force_delta)
-            if len(candidate) == target_len:
-                signature = _signature(candidate)
-                if signature not in used_signatures:
-                    distractors.append(candidate)
-                    used_signatures.add(signature)
-            force_delta += 0.04
-
-        heavy_attempts = 0
-        while len(distractors) < 3 and heavy_attempts < 20:
-            candidate = _aggressive_variant(target_entries, max_delta=0.3)
-            signature = _signature(candidate)
-            if signature not in used_signatures:
-                distractors.append(candidate)
-                used_signatures.add(signature)
-            heavy_attempts += 1
-
-        if not distractors:
-            candidate = _aggressive_variant(target_entries, max_delta=0.3)
-            distractors.append(candidate)
-            used_signatures.add(_signature(candidate))
-
+        # The search stops at three distractors, so sampling is only needed
+        # if that ever changes; answer positions are shuffled downstream.
         selected_distractors = (
-            random.sample(distractors, 3) if len(distractors) >= 3 else distractors[:]
+            distractors if len(distractors) <= 3 else sample(distractors, 3)
         )
         selected_signatures = {_signature(entries) for entries in selected_distractors}
         selected_signatures.add(_signature(target_entries))
 
-        fill_attempts = 0
-        while len(selected_distractors) < 3 and fill_attempts < 50:
-            generated = _aggressive_variant(target_entries, max_delta=0.3)
-            signature = _signature(generated)
-            if signature in selected_signatures:
-                fill_attempts += 1
-                continue
-            selected_distractors.append(generated)
-            selected_signatures.add(signature)
-
-        while len(selected_distractors) < 3:
-            generated = _aggressive_variant(target_entries, max_delta=0.35)
-            selected_distractors.append(generated)
-            selected_signatures.add(_signature(generated))
-
-        choices = [_format_entries(target_entries)]
-        choices.extend(_format_entries(entries) for entries in selected_distractors[:3])
-
-        return SITEData.model_validate(
-            {
-                "source_dataset": data.source_dataset,
-                "source_id": data.source_id,
-                "image": data.image,
-                "question": prompt,
-                "choices": choices,
-                "question_type": self.name,
-            }
+        if len(selected_distractors) < 3:
+            fill_attempts = 0
+            while len(selected_distractors) < 3 and fill_attempts < 50:
+                generated = _aggressive_variant(
+                    target_entries, rng, np_rng, max_delta=0.3
+                )
+                signature = _signature(generated)
+                if signature in selected_signatures:
+                    fill_attempts += 1
+                    continue
+                selected_distractors.append(generated)
+                selected_signatures.add(signature)
+
+            while len(selected_distractors) < 3:
+                generated = _aggressive_variant(
+                    target_entries, rng, np_rng, max_delta=0.35
+                )
+                selected_distractors.append(generated)
+                selected_signatures.add(_signature(generated))
+
+        choices = [
+            _format_entries(target_entries),
+            *map(_format_entries, selected_distractors[:3]),
+        ]
+
+        return SITEData(
+            source_dataset=data.source_dataset,
+            source_id=data.source_id,
+            image=data.image,
+            question=prompt,
+            choices=choices,
+            question_type=self.name,
         )
 
     def _mutate_entries(
@@ -249,57 +307,42 @@ class DetectMultiObjectFormatter(Formatter):
         base_entries: Sequence[tuple[str, Sequence[float]]],
         category_pool: dict[str, list[Sequence[float]]],
         extra_pool: Sequence[tuple[str, Sequence[float]]],
+        max_delta: float = 0.05,
+        max_change: float = 0.6,
     ) -> list[tuple[str, list[float]]]:
+        rng = self._rng
+        rand = rng.random
+        choice = rng.choice
         entries = _clone_entries(base_entries)
         target_len = len(entries)
         if target_len == 0:
             return entries
-        change_fraction = random.uniform(0.3, 0.6)
+        change_fraction = rng.uniform(0.3, max_change)
         change_count = max(1, min(target_len, int(round(change_fraction * target_len))))
-        for idx in random.sample(range(target_len), change_count):
+        for idx in rng.sample(range(target_len), change_count):
             name, bbox = entries[idx]
-            action = random.random()
+            action = rand()
             pool = category_pool.get(name, [])
             alternatives = [candidate for candidate in pool if candidate != bbox]
             if action < 0.5 and alternatives:
-                entries[idx] = (name, list(random.choice(alternatives)))
+                entries[idx] = (name, list(choice(alternatives)))
                 continue
             if action < 0.85:
-                entries[idx] = (name, _jitter_bbox(bbox))
+                entries[idx] = (name, _jitter_bbox(bbox, rng, max_delta))
             else:
                 if extra_pool:
-                    alt_name, alt_bbox = random.choice(extra_pool)
+                    alt_name, alt_bbox = choice(extra_pool)
                     if alt_name == name and alternatives:
-                        entries[idx] = (name, list(random.choice(alternatives)))
+                        entries[idx] = (name, list(choice(alternatives)))
                     else:
-                        entries[idx] = (alt_name, _jitter_bbox(alt_bbox))
+                        entries[idx] = (
+                            alt_name,
+                            _jitter_bbox(alt_bbox, rng, max_delta),
+                        )
                 else:
-                    entries[idx] = (name, _jitter_bbox(bbox))
-        if target_len > 1 and random.random() < 0.4:
-            i, j = random.sample(range(target_len), 2)
+                    entries[idx] = (name, _jitter_bbox(bbox, rng, max_delta))
+        if target_len > 1 and rand() < 0.4:
+            i, j = rng.sample(range(target_len), 2)
             entries[i], entries[j] = entries[j], entries[i]
-        random.shuffle(entries)
-        return entries
-
-    def _fallback_entries(
-        self,
-        base_entries: Sequence[tuple[str, Sequence[float]]],
-        category_pool: dict[str, list[Sequence[float]]],
-    ) -> list[tuple[str, list[float]]]:
-        entries = _clone_entries(base_entries)
-        if not entries:
-            return entries
-        idx = random.randrange(len(entries))
-        name, bbox = entries[idx]
-        pool = category_pool.get(name, [])
-        alternatives = [candidate for candidate in pool if candidate != bbox]
-        if alternatives and random.random() < 0.7:
-            entries[idx] = (name, list(random.choice(alternatives)))
-        else:
-            entries[idx] = (name, _jitter_bbox(bbox, max_delta=0.08))
-        if len(entries) > 1 and random.random() < 0.3:
-            j = random.randrange(len(entries))
-            if j != idx:
-                entries[idx], entries[j] = entries[j], entries[idx]
-        random.shuffle(entries)
+        rng.shuffle(entries)
         return entries
@@ -1,7 +1,7 @@
 import random
 
 from ..datasets.data import GroundingData
-from ..utils.bbox import random_bbox
+from ..utils.bbox import random_bboxes
 from .formatter import Formatter, SITEData
 
 TEMPLATE = """\
@@ -13,46 +13,51 @@ within a normalized range of 0 to 1, where [0, 0] is the top-left corner and \
 [1, 1] is the bottom-right corner of the image.\
 """
 
+_BBOX_FORMAT = "[{:.3f}, {:.3f}, {:.3f}, {:.3f}]".format
+
 
 class DetectSingleFormatter(Formatter):
-    def __init__(self):
+    def __init__(self, seed: int | None = None) -> None:
         super().__init__("detect_single")
+        self._rng = random.Random(seed)
 
     def check_eligible(self, data: GroundingData) -> bool:
-        for obj in data.objs.values():
-            if len(obj) == 1:
-                return True
-        return False
+        return bool(data.singles_and_multis[0])
+
+    def check_objs(self, objs: dict[str, list[list[float]]]) -> bool:
+        return any(len(bboxes) == 1 for bboxes in objs.values())
 
     def format(self, data: GroundingData) -> SITEData:
-        all_single_objs = []
-        other_bboxes = []
-        for key, bboxes in data.objs.items():
-            if len(bboxes) == 1:
-                all_single_objs.append((key, bboxes[0]))
-            else:
-                other_bboxes.extend(bboxes)
-        obj_name, bbox = random.choice(all_single_objs)
-        for n, b in all_single_objs:
+        rng = self._rng
+        singles, multis = data.singles_and_multis
+        obj_name, bbox, stripped_name = rng.choice(singles)
+        other_bboxes = list(multis)
+        for n, b, _ in singles:
             if n != obj_name:
                 other_bboxes.append(b)
-        for start_str in ["a ", "an ", "the "]:
-            if obj_name.startswith(start_str):
-                obj_name = obj_name[len(start_str) :]
-                break
-        input_text = TEMPLATE.format(obj_name=obj_name)
-        choices = [bbox]
-        while len(other_bboxes) < 3:
-            other_bboxes.append(random_bbox(bbox))
-        choices.extend(random.sample(other_bboxes, 3))
-        choices = [str(choice) for choice in choices]
-        return SITEData.model_validate(
-            {
-                "source_dataset": data.source_dataset,
-                "source_id": data.source_id,
-                "image": data.image,
-                "question": input_text,
-                "choices": choices,
-                "question_type": self.name,
-            }
+        input_text = TEMPLATE.format(obj_name=stripped_name)
+        # Real boxes can differ only past the third decimal and then print
+        # like the answer or each other, so dedupe on the formatted strings.
+        answer = _BBOX_FORMAT(*bbox)
+        seen = {answer}
+        distractors = []
+        for other in other_bboxes:
+            text = _BBOX_FORMAT(*other)
+            if text not in seen:
+                seen.add(text)
+                distractors.append(text)
+        while len(distractors) < 3:
+            for sampled in random_bboxes(bbox, 3 - len(distractors), rng):
+                text = _BBOX_FORMAT(*sampled)
+                if text not in seen:
+                    seen.add(text)
+                    distractors.append(text)
+        choices = [answer, *rng.sample(distractors, 3)]
+        return SITEData(
+            source_dataset=data.source_dataset,
+            source_id=data.source_id,
+            image=data.image,
+            question=input_text,
+            choices=choices,
+            question_type=self.name,
         )
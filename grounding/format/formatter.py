@@ -1,11 +1,12 @@
 from abc import ABC, abstractmethod
-
-from pydantic import BaseModel
+from typing import TypedDict
 
 from ..datasets.data import GroundingData
 
 
-class SITEData(BaseModel):
+# A plain dict at runtime: every field is already a primitive, so records can
+# be serialised directly without a model round trip.
+class SITEData(TypedDict):
     source_dataset: str
     source_id: str
     image: str
@@ -25,3 +26,17 @@ class Formatter(ABC):
     @abstractmethod
     def format(self, data: GroundingData) -> SITEData:
         raise NotImplementedError
+
+    def check_objs(self, objs: dict[str, list[list[float]]]) -> bool:
+        """Cheap pre-check on raw ``objs``, before the record is validated.
+
+        It may accept records that :meth:`check_eligible` rejects, but must
+        never reject one that it accepts.
+        """
+        return True
+
+    def try_format(self, data: GroundingData) -> SITEData | None:
+        """Format ``data``, or return ``None`` if it is not eligible."""
+        if not self.check_eligible(data):
+            return None
+        return self.format(data)
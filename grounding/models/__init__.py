@@ -1,8 +1,12 @@
+from functools import cache
+
 from .model import Model
 
 __all__ = ["get_model", "Model"]
 
 
+# Memoized so repeated requests for a model share one constructed client
+@cache
 def get_model(model_name: str, *args, **kwargs) -> Model:
     from .gpt_oss import GPTOSS
 
@@ -1,4 +1,9 @@
-from openai import OpenAI
+import asyncio
+from collections.abc import Sequence
+from functools import cache
+from typing import Self
+
+from openai import AsyncOpenAI, OpenAI
 
 from .model import Model
 
@@ -8,27 +13,105 @@ class GPTOSS(Model):
         self.openai_api_key = "EMPTY"
         self.openai_api_base = "http://localhost:8000/v1"
         self.client = OpenAI(
-            api_key=self.openai_api_key, base_url=self.openai_api_base, max_retries=5
+            api_key=self.openai_api_key,
+            base_url=self.openai_api_base,
+            max_retries=max_retries,
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=self.openai_api_key,
+            base_url=self.openai_api_base,
+            max_retries=max_retries,
+        )
+        # AsyncOpenAI pools connections on the loop that first uses them, so
+        # every batch runs on this one loop instead of a fresh asyncio.run.
+        self._runner = asyncio.Runner()
+        self.model = GPTOSS._discover_model(
+            self.openai_api_base, self.openai_api_key, max_retries
         )
-        models = self.client.models.list()
-        self.model = models.data[0].id
 
-    def generate(self, prompt: str) -> str:
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt},
-        ]
+        # Identical for every request, so build them once
+        self._system_message = {
+            "role": "system",
+            "content": "You are a helpful assistant.",
+        }
+        self._extra_body = {"chat_template_kwargs": {"thinking": True}}
+
+    @staticmethod
+    @cache
+    def _discover_model(base_url: str, api_key: str, max_retries: int) -> str:
+        # One models.list() round trip per endpoint, however many instances
+        with OpenAI(
+            api_key=api_key, base_url=base_url, max_retries=max_retries
+        ) as client:
+            return client.models.list().data[0].id
 
-        extra_body = {"chat_template_kwargs": {"thinking": True}}
+    def _messages(self, prompt: str) -> list[dict[str, str]]:
+        return [self._system_message, {"role": "user", "content": prompt}]
 
+    def generate(self, prompt: str) -> str:
         response = self.client.chat.completions.create(
-            model=self.model, messages=messages, extra_body=extra_body
+            model=self.model,
+            messages=self._messages(prompt),
+            extra_body=self._extra_body,
         )
 
         content = response.choices[0].message.content
 
         return content
 
+    async def agenerate(self, prompt: str) -> str:
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt),
+            extra_body=self._extra_body,
+        )
+        return response.choices[0].message.content
+
+    def generate_batch(
+        self, prompts: Sequence[str], concurrency: int = 64
+    ) -> list[str]:
+        """Generate ``prompts`` with at most ``concurrency`` requests in flight.
+
+        This blocks on the model's own event loop, so it cannot be called
+        while another loop is running (e.g. in Jupyter); await
+        :meth:`agenerate_batch` there instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self._runner.run(self.agenerate_batch(prompts, concurrency))
+        raise RuntimeError(
+            "generate_batch() cannot be called from a running event loop; "
+            "await agenerate_batch() instead"
+        )
+
+    async def agenerate_batch(
+        self, prompts: Sequence[str], concurrency: int = 64
+    ) -> list[str]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def generate_one(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate(prompt)
+
+        return await asyncio.gather(*(generate_one(prompt) for prompt in prompts))
+
+    def close(self) -> None:
+        """Close both clients and the event loop used by :meth:`generate_batch`.
+
+        Instances returned by ``get_model`` are shared, so only close those
+        once nothing else will use them.
+        """
+        self._runner.run(self.async_client.close())
+        self._runner.close()
+        self.client.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
 
 if __name__ == "__main__":
     model = GPTOSS()
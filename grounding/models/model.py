@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 
 
 class Model(ABC):
     @abstractmethod
     def generate(self, prompt: str) -> str:
         raise NotImplementedError
+
+    def generate_batch(self, prompts: Sequence[str]) -> list[str]:
+        return [self.generate(prompt) for prompt in prompts]
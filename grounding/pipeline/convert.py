@@ -1,19 +1,27 @@
 from __future__ import annotations
 
 import argparse
-import json
+import os
 import random
-from collections.abc import Callable, Iterable, Iterator, Sequence
+import shutil
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 from typing import NamedTuple
 
+import orjson
+
+from ..utils.jsonl import iter_jsonl, split_jsonl
+
 DATASET_NAMES = [
     "detect_single",
     "detect_multi",
     "detect_multi_object",
 ]
 
-OPTION_LETTERS = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+OPTION_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+WRITE_BATCH_SIZE = 1 << 20
 
 
 class InstructionContext(NamedTuple):
@@ -27,15 +35,6 @@ class ResponseStyle(NamedTuple):
     answer_builder: Callable[[str], str]
 
 
-def _load_jsonl(path: Path) -> Iterator[dict]:
-    with path.open("r") as handle:
-        for line in handle:
-            stripped = line.strip()
-            if not stripped:
-                continue
-            yield json.loads(stripped)
-
-
 def _ensure_list(image_field: str | Sequence[str]) -> list[str]:
     if isinstance(image_field, str):
         return [image_field]
@@ -48,34 +47,29 @@ def _shuffle_choices(
     if len(choices) > len(OPTION_LETTERS):
         raise ValueError("Too many choices to assign unique letters")
 
-    indexed = list(enumerate(choices))
-    rng.shuffle(indexed)
-
-    option_pairs: list[tuple[str, str]] = []
-    correct_letter: str | None = None
+    # Shuffle positions rather than (index, text) tuples; this consumes the
+    # rng exactly as before.
+    order = list(range(len(choices)))
+    rng.shuffle(order)
 
-    for position, (original_index, choice_text) in enumerate(indexed):
-        letter = OPTION_LETTERS[position]
-        option_pairs.append((letter, choice_text))
-        if original_index == 0:
-            correct_letter = letter
-
-    if correct_letter is None:
-        raise ValueError("Unable to determine correct answer after shuffling")
+    option_pairs = [
+        (OPTION_LETTERS[position], choices[original_index])
+        for position, original_index in enumerate(order)
+    ]
+    correct_letter = OPTION_LETTERS[order.index(0)]
 
     return option_pairs, correct_letter
 
 
-def _letter_instruction(option_pairs: Sequence[tuple[str, str]]) -> str:
-    letters = [letter for letter, _ in option_pairs]
+def _letter_instruction(letters: Sequence[str]) -> str:
     if len(letters) == 4:
         return "A/B/C/D"
     return "/".join(letters)
 
 
-def _instruction_context(option_pairs: Sequence[tuple[str, str]]) -> InstructionContext:
-    letters = tuple(letter for letter, _ in option_pairs)
-    descriptor = _letter_instruction(option_pairs)
+def _instruction_context(option_count: int) -> InstructionContext:
+    letters = tuple(OPTION_LETTERS[:option_count])
+    descriptor = _letter_instruction(letters)
     lowercase_descriptor = "/".join(letter.lower() for letter in letters)
     return InstructionContext(letters, descriptor, lowercase_descriptor)
 
@@ -90,7 +84,7 @@ def _template_block(
         "",
         "Options:",
     ]
-    lines.extend(f"{letter}. {text}" for letter, text in option_pairs)
+    lines.extend([f"{letter}. {text}" for letter, text in option_pairs])
     if instruction_lines:
         lines.append("")
         lines.extend(instruction_lines)
@@ -108,7 +102,7 @@ def _template_inline(
         lines.extend(instruction_lines)
     lines.append("")
     lines.append("Options:")
-    rendered_options = " ".join(f"{letter}) {text}" for letter, text in option_pairs)
+    rendered_options = " ".join([f"{letter}) {text}" for letter, text in option_pairs])
     lines.append(rendered_options)
     return "\n".join(lines)
 
@@ -123,7 +117,7 @@ def _template_steps(
         "",
         "Consider these candidates:",
     ]
-    lines.extend(f"- Option {letter}: {text}" for letter, text in option_pairs)
+    lines.extend([f"- Option {letter}: {text}" for letter, text in option_pairs])
     if instruction_lines:
         lines.append("")
         lines.extend(instruction_lines)
@@ -178,6 +172,16 @@ RESPONSE_STYLES = [
     ResponseStyle(_style_option_prefix, lambda letter: f"Option {letter}"),
 ]
 
+# Instruction lines only depend on the style and the number of options, so
+# build them once per (style, option count) instead of once per record.
+STYLE_LINES: list[dict[int, tuple[str, ...]]] = [
+    {
+        count: tuple(style.instruction_builder(_instruction_context(count)))
+        for count in range(2, len(OPTION_LETTERS) + 1)
+    }
+    for style in RESPONSE_STYLES
+]
+
 
 def _convert_record(record: dict, rng: random.Random) -> dict:
     choices = record.get("choices")
@@ -189,9 +193,10 @@ def _convert_record(record: dict, rng: random.Random) -> dict:
     option_pairs, correct_letter = _shuffle_choices(choices, rng)
     question = record.get("question", "").strip()
 
-    context = _instruction_context(option_pairs)
-    style = rng.choice(RESPONSE_STYLES)
-    instruction_lines = style.instruction_builder(context)
+    # randrange draws exactly like rng.choice(RESPONSE_STYLES) would
+    style_index = rng.randrange(len(RESPONSE_STYLES))
+    style = RESPONSE_STYLES[style_index]
+    instruction_lines = STYLE_LINES[style_index][len(option_pairs)]
     if not instruction_lines:
         raise ValueError("Instruction builder returned no content")
 
@@ -223,20 +228,40 @@ def _convert_record(record: dict, rng: random.Random) -> dict:
     }
 
 
-def _convert_file(path: Path, output_dir: Path, rng: random.Random) -> Path:
-    if not path.exists():
-        raise FileNotFoundError(f"Input file not found: {path}")
-
-    output_path = output_dir / f"{path.stem}_chat.jsonl"
-
-    with output_path.open("w") as output_handle:
-        for record in _load_jsonl(path):
+def _convert_file(
+    path: Path,
+    output_path: Path,
+    rng: random.Random,
+    start: int = 0,
+    end: int | None = None,
+) -> Path:
+    buffer = bytearray()
+    with output_path.open("wb", buffering=WRITE_BATCH_SIZE) as output_handle:
+        for record in iter_jsonl(path, start, end):
             converted = _convert_record(record, rng)
-            output_handle.write(json.dumps(converted) + "\n")
+            buffer += orjson.dumps(converted, option=orjson.OPT_APPEND_NEWLINE)
+            if len(buffer) >= WRITE_BATCH_SIZE:
+                output_handle.write(buffer)
+                buffer.clear()
+        output_handle.write(buffer)
 
     return output_path
 
 
+def _concat_parts(part_paths: Sequence[Path], output_path: Path) -> None:
+    with output_path.open("wb") as output_handle:
+        for part_path in part_paths:
+            with part_path.open("rb") as part_handle:
+                shutil.copyfileobj(part_handle, output_handle, WRITE_BATCH_SIZE)
+            part_path.unlink()
+
+
+def _shard_rng(seed: int | None, name: str, shard: int) -> random.Random:
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}:{name}:{shard}")
+
+
 def main(argv: Iterable[str] | None = None) -> None:
     parser = argparse.ArgumentParser(
         description="Convert grounding data to chat format."
@@ -247,19 +272,49 @@ def main(argv: Iterable[str] | None = None) -> None:
         default=None,
         help="Optional random seed for deterministic shuffling.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help=(
+            "Number of worker processes; each input file is split into this "
+            "many shards, so seeded output depends on it as well."
+        ),
+    )
     args = parser.parse_args(list(argv) if argv is not None else None)
 
-    rng = random.Random(args.seed)
-
     root = Path(__file__).resolve().parents[2]
     data_dir = root / "data"
     output_dir = root / "final_data"
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    for name in DATASET_NAMES:
-        input_path = data_dir / f"{name}.jsonl"
-        output_path = _convert_file(input_path, output_dir, rng)
-        print(f"Converted {input_path} -> {output_path}")
+    input_paths = [data_dir / f"{name}.jsonl" for name in DATASET_NAMES]
+    for input_path in input_paths:
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        pending: list[tuple[Path, list[Future[Path]]]] = []
+        for name, input_path in zip(DATASET_NAMES, input_paths, strict=True):
+            parts = [
+                executor.submit(
+                    _convert_file,
+                    input_path,
+                    output_dir / f"{input_path.stem}_chat.part{shard}.jsonl",
+                    _shard_rng(args.seed, name, shard),
+                    start,
+                    end,
+                )
+                for shard, (start, end) in enumerate(
+                    split_jsonl(input_path, args.workers)
+                )
+            ]
+            pending.append((input_path, parts))
+
+        for input_path, parts in pending:
+            output_path = output_dir / f"{input_path.stem}_chat.jsonl"
+            _concat_parts([part.result() for part in parts], output_path)
+            print(f"Converted {input_path} -> {output_path}")
 
 
 if __name__ == "__main__":
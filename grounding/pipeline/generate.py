@@ -1,78 +1,237 @@
 from __future__ import annotations
 
 import json
-from contextlib import ExitStack
+import multiprocessing as mp
+import os
+from collections.abc import Callable, Iterable, MutableSequence, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AbstractContextManager, ExitStack, nullcontext
 from pathlib import Path
-from typing import NamedTuple
+from typing import TYPE_CHECKING, NamedTuple
+
+import orjson
+from pydantic import TypeAdapter
 
 from ..datasets.data import GroundingData
 from ..format.detect_multi_formatter import DetectMultiFormatter
 from ..format.detect_multi_object_formatter import DetectMultiObjectFormatter
 from ..format.detect_single_formatter import DetectSingleFormatter
+from ..format.formatter import Formatter
+from ..utils.jsonl import iter_jsonl, split_jsonl
+
+if TYPE_CHECKING:
+    from multiprocessing.sharedctypes import SynchronizedArray
 
 
 class FormatterSpec(NamedTuple):
     name: str
-    formatter: object
+    formatter_type: type[Formatter]
     output_path: Path
 
 
 TARGET_COUNT = 1_000_000
 
+SHARD_SIZE = 128 << 20
+
+_GROUNDING_DATA = TypeAdapter(GroundingData)
+
+# Per-formatter output counts shared by every worker, so that shards stop
+# feeding a formatter as soon as its target is met anywhere.
+_counts: SynchronizedArray | None = None
+
 
 def _root_dir() -> Path:
     return Path(__file__).resolve().parents[2]
 
 
+def _part_path(output_path: Path, shard: int) -> Path:
+    return output_path.with_name(f"{output_path.stem}.part{shard}.jsonl")
+
+
+def _init_worker(counts: SynchronizedArray) -> None:
+    global _counts
+    _counts = counts
+
+
+def _fill_targets(
+    records: Iterable[dict],
+    formatters: Sequence[Formatter],
+    targets: Sequence[int],
+    counts: MutableSequence[int],
+    lock: AbstractContextManager,
+    writes: Sequence[Callable[[bytes], object]],
+    used_items: set[int],
+) -> None:
+    """Hand each unused record to the first unfilled formatter that accepts it.
+
+    ``counts`` may be shared with other processes: the count pre-checks are
+    unlocked and a record is only claimed after re-checking under ``lock``.
+    """
+    # Bound methods are resolved once so the per-record loop only indexes
+    # tuples instead of dispatching through each formatter and handle.
+    checks = tuple(formatter.check_objs for formatter in formatters)
+    formats = tuple(formatter.try_format for formatter in formatters)
+    indices = range(len(formatters))
+    validate = _GROUNDING_DATA.validate_python
+    dumps = orjson.dumps
+    option = orjson.OPT_APPEND_NEWLINE
+
+    for record in records:
+        if all(map(int.__ge__, counts, targets)):
+            break
+
+        # Hashes are only compared within this process, so str hash
+        # randomisation does not matter and no id strings need to be built.
+        unique_id = hash((record["source_dataset"], record["source_id"]))
+        if unique_id in used_items:
+            continue
+
+        # Only validate records that some unfilled formatter may accept
+        objs = record["objs"]
+        candidates = [
+            idx for idx in indices if counts[idx] < targets[idx] and checks[idx](objs)
+        ]
+        if not candidates:
+            continue
+
+        data = validate(record)
+        for idx in candidates:
+            formatted = formats[idx](data)
+            if formatted is None:
+                continue
+            with lock:
+                claimed = counts[idx] < targets[idx]
+                if claimed:
+                    counts[idx] += 1
+            if claimed:
+                writes[idx](dumps(formatted, option=option))
+                used_items.add(unique_id)
+                break
+
+
+def _generate_shard(
+    dataset_path: Path,
+    start: int,
+    end: int,
+    formatter_specs: list[FormatterSpec],
+    targets: list[int],
+    shard: int,
+) -> None:
+    with ExitStack() as stack:
+        writes = tuple(
+            stack.enter_context(_part_path(spec.output_path, shard).open("wb")).write
+            for spec in formatter_specs
+        )
+        _fill_targets(
+            iter_jsonl(dataset_path, start, end),
+            [spec.formatter_type() for spec in formatter_specs],
+            targets,
+            _counts.get_obj(),
+            _counts.get_lock(),
+            writes,
+            set(),
+        )
+
+
+def _merge_parts(
+    spec: FormatterSpec, num_shards: int, target: int, used_items: set[int]
+) -> int:
+    # Shards only deduplicate their own records, so drop items that an
+    # earlier shard or formatter already used.
+    count = 0
+    with spec.output_path.open("wb") as output_handle:
+        for shard in range(num_shards):
+            part_path = _part_path(spec.output_path, shard)
+            with part_path.open("rb") as part_handle:
+                for line in part_handle:
+                    if count >= target:
+                        break
+                    record = orjson.loads(line)
+                    unique_id = hash((record["source_dataset"], record["source_id"]))
+                    if unique_id in used_items:
+                        continue
+                    used_items.add(unique_id)
+                    output_handle.write(line)
+                    count += 1
+            part_path.unlink()
+    return count
+
+
 def main() -> None:
     root = _root_dir()
     dataset_path = root / "data" / "result_dataset.jsonl"
     formatter_specs = [
         FormatterSpec(
             "detect_single",
-            DetectSingleFormatter(),
+            DetectSingleFormatter,
             root / "data" / "detect_single.jsonl",
         ),
         FormatterSpec(
-            "detect_multi", DetectMultiFormatter(), root / "data" / "detect_multi.jsonl"
+            "detect_multi", DetectMultiFormatter, root / "data" / "detect_multi.jsonl"
         ),
         FormatterSpec(
             "detect_multi_object",
-            DetectMultiObjectFormatter(),
+            DetectMultiObjectFormatter,
             root / "data" / "detect_multi_object.jsonl",
         ),
     ]
-
-    counts: dict[str, int] = {spec.name: 0 for spec in formatter_specs}
     targets: dict[str, int] = {spec.name: TARGET_COUNT for spec in formatter_specs}
-    used_items: set[str] = set()
 
-    with ExitStack() as stack:
-        handles = {
-            spec.name: stack.enter_context(spec.output_path.open("w"))
-            for spec in formatter_specs
-        }
-
-        with dataset_path.open("r") as source_file:
-            for line in source_file:
-                data = GroundingData.model_validate_json(line)
-                unique_id = f"{data.source_dataset}:{data.source_id}"
-                if unique_id in used_items:
-                    continue
-
-                for spec in formatter_specs:
-                    if counts[spec.name] >= targets[spec.name]:
-                        continue
-                    formatter = spec.formatter
-                    if formatter.check_eligible(data):
-                        formatted = formatter.format(data)
-                        handles[spec.name].write(formatted.model_dump_json() + "\n")
-                        counts[spec.name] += 1
-                        used_items.add(unique_id)
-                        break
+    # Workers share the per-formatter counts and stop once every target is
+    # met, but shards run concurrently, so which records end up in the
+    # output differs from a serial pass.
+    num_workers = os.cpu_count() or 1
+    num_shards = max(num_workers, -(-dataset_path.stat().st_size // SHARD_SIZE))
+    shards = split_jsonl(dataset_path, num_shards)
+    ctx = mp.get_context("spawn")
+    counts = ctx.Array("q", len(formatter_specs))
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(counts,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _generate_shard,
+                dataset_path,
+                start,
+                end,
+                formatter_specs,
+                list(targets.values()),
+                shard,
+            )
+            for shard, (start, end) in enumerate(shards)
+        ]
+        for future in futures:
+            future.result()
+
+    used_items: set[int] = set()
+    counts: dict[str, int] = {
+        spec.name: _merge_parts(spec, len(shards), targets[spec.name], used_items)
+        for spec in formatter_specs
+    }
 
-                if all(counts[name] >= targets[name] for name in counts):
-                    break
+    # A record repeated across shards can be claimed by more than one worker
+    # and is then dropped by the merge. Top up any shortfall with a serial
+    # pass over the records that are still unused.
+    if any(counts[name] < targets[name] for name in counts):
+        topped_up = list(counts.values())
+        with ExitStack() as stack:
+            writes = tuple(
+                stack.enter_context(spec.output_path.open("ab")).write
+                for spec in formatter_specs
+            )
+            _fill_targets(
+                iter_jsonl(dataset_path),
+                [spec.formatter_type() for spec in formatter_specs],
+                list(targets.values()),
+                topped_up,
+                nullcontext(),
+                writes,
+                used_items,
+            )
+        counts = dict(zip(counts, topped_up, strict=True))
 
     missing = {
         name: targets[name] - counts[name]
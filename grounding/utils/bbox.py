@@ -1,6 +1,6 @@
 import random
 
-import numpy as np
+_MAX_ATTEMPTS = 100
 
 
 def in_box(bbox: list[float], larger_bbox: list[float]) -> bool:
@@ -12,46 +12,46 @@ def in_box(bbox: list[float], larger_bbox: list[float]) -> bool:
     )
 
 
-def random_bbox(original_bbox: list[float]) -> list[float]:
-    probs = [0.6, 0.3, 0.1]
-    probs = np.cumsum(probs)
-    rand_choice = random.random()
-    if rand_choice < probs[0]:
-        bbox = [
-            original_bbox[0] + random.uniform(-0.1, 0.1),
-            original_bbox[1] + random.uniform(-0.1, 0.1),
-            original_bbox[2] + random.uniform(-0.1, 0.1),
-            original_bbox[3] + random.uniform(-0.1, 0.1),
-        ]
-    elif rand_choice < probs[1]:
-        bbox = [
-            original_bbox[0] + random.uniform(-0.3, 0.3),
-            original_bbox[1] + random.uniform(-0.3, 0.3),
-            original_bbox[2] + random.uniform(-0.3, 0.3),
-            original_bbox[3] + random.uniform(-0.3, 0.3),
-        ]
-    else:
-        bbox = [
-            random.uniform(0, 1),
-            random.uniform(0, 1),
-            random.uniform(0, 1),
-            random.uniform(0, 1),
-        ]
-
-    bbox = [max(0, min(1, round(coord, 3))) for coord in bbox]
-    if bbox[0] > bbox[2]:
-        bbox[0], bbox[2] = bbox[2], bbox[0]
-    if bbox[1] > bbox[3]:
-        bbox[1], bbox[3] = bbox[3], bbox[1]
-
-    area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
-
-    if (
-        area < 0.01
-        or area > 0.9
-        or in_box(bbox, original_bbox)
-        or in_box(original_bbox, bbox)
-    ):
-        return random_bbox(original_bbox)
-
-    return bbox
+def random_bbox(
+    original_bbox: list[float], rng: random.Random | None = None
+) -> list[float]:
+    # Draw from the global ``random`` module unless a generator is given, so
+    # callers that seed either one get reproducible boxes.
+    source = random if rng is None else rng
+    rand = source.random
+    uniform = source.uniform
+    x1, y1, x2, y2 = original_bbox
+    for _ in range(_MAX_ATTEMPTS):
+        rand_choice = rand()
+        if rand_choice < 0.9:
+            delta = 0.1 if rand_choice < 0.6 else 0.3
+            bbox = [
+                x1 + uniform(-delta, delta),
+                y1 + uniform(-delta, delta),
+                x2 + uniform(-delta, delta),
+                y2 + uniform(-delta, delta),
+            ]
+        else:
+            bbox = [uniform(0, 1), uniform(0, 1), uniform(0, 1), uniform(0, 1)]
+
+        bbox = [max(0, min(1, round(coord, 3))) for coord in bbox]
+        if bbox[0] > bbox[2]:
+            bbox[0], bbox[2] = bbox[2], bbox[0]
+        if bbox[1] > bbox[3]:
+            bbox[1], bbox[3] = bbox[3], bbox[1]
+
+        area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        if not (
+            area < 0.01
+            or area > 0.9
+            or in_box(bbox, original_bbox)
+            or in_box(original_bbox, bbox)
+        ):
+            return bbox
+    raise ValueError(f"Unable to sample a distractor bbox for {original_bbox}")
+
+
+def random_bboxes(
+    original_bbox: list[float], n: int, rng: random.Random | None = None
+) -> list[list[float]]:
+    return [random_bbox(original_bbox, rng) for _ in range(n)]
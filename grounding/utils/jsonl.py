@@ -0,0 +1,84 @@
+import os
+from collections.abc import Iterator
+from itertools import pairwise
+from pathlib import Path
+from typing import BinaryIO
+
+import orjson
+
+_READ_CHUNK_SIZE = 4 << 20
+_READAHEAD_SHARDS = 4
+
+
+def _advise(f: BinaryIO, advice: int) -> None:
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, advice)
+        except OSError:
+            pass
+
+
+def readahead(paths: list[Path]) -> Iterator[Path]:
+    """Yield ``paths`` while asking the kernel to prefetch the next shards."""
+    if not hasattr(os, "posix_fadvise"):
+        yield from paths
+        return
+    for idx, path in enumerate(paths):
+        # Advise the whole window up front, then only the shard entering it.
+        start = idx + 1 if idx == 0 else idx + _READAHEAD_SHARDS
+        for upcoming in paths[start : idx + 1 + _READAHEAD_SHARDS]:
+            try:
+                with upcoming.open("rb") as f:
+                    _advise(f, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+        yield path
+
+
+def iter_jsonl(path: Path, start: int = 0, end: int | None = None) -> Iterator[dict]:
+    """Decode the records in ``path``, optionally limited to ``[start, end)``.
+
+    The range must be line aligned, e.g. as produced by :func:`split_jsonl`.
+    """
+    buffer = bytearray()
+    remaining = None if end is None else end - start
+    with path.open("rb") as f:
+        if hasattr(os, "POSIX_FADV_SEQUENTIAL"):
+            _advise(f, os.POSIX_FADV_SEQUENTIAL)
+        f.seek(start)
+        while remaining is None or remaining > 0:
+            size = (
+                _READ_CHUNK_SIZE
+                if remaining is None
+                else min(_READ_CHUNK_SIZE, remaining)
+            )
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            buffer += chunk
+            end_of_lines = buffer.rfind(b"\n")
+            if end_of_lines < 0:
+                continue
+            for line in buffer[:end_of_lines].split(b"\n"):
+                if line.strip():
+                    yield orjson.loads(line)
+            del buffer[: end_of_lines + 1]
+    if buffer.strip():
+        yield orjson.loads(buffer)
+
+
+def split_jsonl(path: Path, num_shards: int) -> list[tuple[int, int]]:
+    """Split ``path`` into at most ``num_shards`` line-aligned byte ranges."""
+    size = path.stat().st_size
+    bounds = [0]
+    with path.open("rb") as f:
+        for shard in range(1, num_shards):
+            f.seek(size * shard // num_shards)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return [(start, end) for start, end in pairwise(bounds) if start < end]
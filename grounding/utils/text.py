@@ -0,0 +1,8 @@
+_ARTICLES = ("a ", "an ", "the ")
+
+
+def strip_article(name: str) -> str:
+    if name.startswith(_ARTICLES):
+        # Every article ends at the first space
+        return name.partition(" ")[2]
+    return name